@@ -1,19 +1,188 @@
+import math
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
+# Replaced by numba.prange once the JIT kernels are loaded
+prange = range
+
 # Initialize player ELO ratings
 INITIAL_ELO = 1500
 K_BASE = 30  # Base K-factor
 
+# 10 ** (x / 400) == exp(x * ln(10) / 400), which avoids a pow() per pair
+_LN10_OVER_400 = math.log(10) / 400.0
+
+# Numba fastmath flags, minus 'nnan'/'ninf' so NaN or infinite profits
+# propagate the same way they do in the NumPy kernel
+_FASTMATH = {'nsz', 'arcp', 'contract', 'afn', 'reassoc'}
+
+# Sessions with at least this many players use the Numba kernels; smaller
+# ones stay on the NumPy kernel so short runs never import or compile numba
+_JIT_MIN_PLAYERS = 16
+
+# Sessions with at least this many players use the multithreaded kernel
+_PARALLEL_MIN_PLAYERS = 32
+
+def _elo_deltas_numpy(ratings, profits, k_base, ln10_over_400):
+    """Return each player's rating change for one session (NumPy broadcasting)."""
+    avg_profit = float(np.abs(profits).sum()) / profits.shape[0] + 1e-6  # Avoid division by zero
+
+    # Pairwise profit differences: diff[i, j] = Pi - Pj
+    diff = np.subtract.outer(profits, profits)
+
+    # The operations below run in place on three N x N buffers instead of
+    # allocating a new temporary for every intermediate expression
+
+    # Actual scores: 1 for a win, 0 for a loss, 0.5 for a tie
+    update = np.sign(diff)
+    update += 1.0
+    update *= 0.5
+
+    # Expected scores of i against j: 1 / (1 + exp(C * (Rj - Ri)))
+    E = np.subtract.outer(ratings, ratings)
+    E *= -ln10_over_400
+    np.exp(E, out=E)
+    E += 1.0
+    np.reciprocal(E, out=E)
+    update -= E
+
+    # Dynamic K-factor based on profit difference, reusing the diff buffer
+    K = np.abs(diff, out=diff)
+    K *= k_base / avg_profit
+    K += k_base
+    update *= K
+
+    # The update matrix is antisymmetric, so each row sum is that player's
+    # net change against everyone else in the session
+    np.fill_diagonal(update, 0.0)
+    return update.sum(axis=1)
+
+def _mean_abs_profit(profits):
+    """Return the mean absolute profit, accumulated without an abs() temporary."""
+    n = profits.shape[0]
+    total = 0.0
+    for i in range(n):
+        total += profits[i] if profits[i] >= 0 else -profits[i]
+    return total / n + 1e-6  # Avoid division by zero
+
+def _pair_update(Ra, Rb, Pa, Pb, avg_profit, k_base, ln10_over_400):
+    """Return the rating change of player a from its result against player b."""
+    diff = Pa - Pb
+
+    if diff == 0.0:
+        # A tie still pulls unequal ratings together, so only pairs
+        # that are also level on rating can be skipped outright
+        if Ra == Rb:
+            return 0.0
+        Sa = 0.5
+        K = k_base
+    else:
+        # Actual score of a against b
+        Sa = 1.0 if diff > 0 else 0.0
+
+        # Dynamic K-factor based on profit difference
+        K = k_base * (1.0 + abs(diff) / avg_profit)
+
+    # Expected score of a against b
+    Ea = 1.0 / (1.0 + math.exp(ln10_over_400 * (Rb - Ra)))
+
+    return K * (Sa - Ea)
+
+def _elo_deltas_loop(ratings, profits, k_base, ln10_over_400):
+    """Return each player's rating change for one session (pairwise loop, JIT target)."""
+    n = ratings.shape[0]
+    avg_profit = _mean_abs_profit(profits)
+    delta = np.zeros(n)
+
+    for i in range(n):
+        for j in range(i + 1, n):
+            update = _pair_update(ratings[i], ratings[j], profits[i], profits[j],
+                                  avg_profit, k_base, ln10_over_400)
+            delta[i] += update
+            delta[j] -= update
+
+    return delta
+
+def _elo_deltas_parallel_loop(ratings, profits, k_base, ln10_over_400):
+    """Return each player's rating change for one session (rows split across threads)."""
+    n = ratings.shape[0]
+    avg_profit = _mean_abs_profit(profits)
+
+    # Each thread owns whole rows of the scratchpad, so no writes are shared
+    pair_updates = np.zeros((n, n))
+    for i in prange(n):
+        for j in range(i + 1, n):
+            pair_updates[i, j] = _pair_update(ratings[i], ratings[j], profits[i], profits[j],
+                                              avg_profit, k_base, ln10_over_400)
+
+    # Upper triangle holds i's gain against j; j loses the same amount
+    return pair_updates.sum(axis=1) - pair_updates.sum(axis=0)
+
+_jit_kernels = None  # (serial, parallel) once loaded, False if numba is missing
+
+def _load_jit_kernels():
+    """Import numba and JIT-compile the loop kernels on first use.
+
+    Returns the (serial, parallel) kernels, or None if numba is not installed.
+    """
+    global _jit_kernels, _mean_abs_profit, _pair_update, prange
+    if _jit_kernels is None:
+        try:
+            import numba
+        except ImportError:  # numba is optional; fall back to the NumPy kernel
+            _jit_kernels = False
+        else:
+            # The loop kernels resolve these module globals when compiled
+            prange = numba.prange
+            _mean_abs_profit = numba.njit(cache=True, fastmath=_FASTMATH)(_mean_abs_profit)
+            _pair_update = numba.njit(cache=True, fastmath=_FASTMATH)(_pair_update)
+            _jit_kernels = (
+                numba.njit(cache=True, fastmath=_FASTMATH)(_elo_deltas_loop),
+                numba.njit(cache=True, fastmath=_FASTMATH, parallel=True)(_elo_deltas_parallel_loop),
+            )
+    return _jit_kernels or None
+
+def _elo_deltas(ratings, profits, k_base, ln10_over_400):
+    """Return each player's rating change, picking a kernel by session size."""
+    n = ratings.shape[0]
+    kernels = _load_jit_kernels() if n >= _JIT_MIN_PLAYERS else None
+    if kernels is None:
+        return _elo_deltas_numpy(ratings, profits, k_base, ln10_over_400)
+
+    serial, parallel = kernels
+    if n >= _PARALLEL_MIN_PLAYERS:
+        return parallel(ratings, profits, k_base, ln10_over_400)
+    return serial(ratings, profits, k_base, ln10_over_400)
+
 class PokerELO:
     def __init__(self, players):
-        self.elo_ratings = {player: INITIAL_ELO for player in players}
-        self.last_played = {player: None for player in players}  # Track last play date for each player
+        # Ratings are stored as parallel arrays indexed by player position
+        self.names = list(players)
+        self.idx = {player: i for i, player in enumerate(self.names)}
+        self._ratings = np.full(len(self.names), INITIAL_ELO, dtype=np.float64)
+        self.last_played = np.full(len(self.names), np.datetime64('NaT'), dtype='datetime64[ns]')  # Track last play date for each player
+        self._ranking_cache = None  # Sorted rankings, cleared whenever ratings change
+
+    @property
+    def ratings(self):
+        """Return current ratings as a read-only array indexed like self.names.
+
+        Ratings only change through update_elo/update_elo_indexed, which also
+        invalidate the cached rankings.
+        """
+        view = self._ratings.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def elo_ratings(self):
+        """Return current ratings as a dict of {player_name: rating}."""
+        return dict(zip(self.names, self._ratings.tolist()))
 
     def expected_score(self, Ra, Rb):
         """Calculate expected probability of winning."""
-        return 1 / (1 + 10 ** ((Rb - Ra) / 400))
+        return 1 / (1 + math.exp(_LN10_OVER_400 * (Rb - Ra)))
 
     def update_elo(self, session_results, session_date=None):
         """
@@ -21,40 +190,61 @@ class PokerELO:
         session_results: dict of {player_name: net_profit}
         session_date: datetime object for the session date
         """
-        if session_date is None:
-            session_date = datetime.now()
+        n = len(session_results)
+        sel = np.fromiter((self.idx[player] for player in session_results), dtype=np.intp, count=n)
+        profits = np.fromiter(session_results.values(), dtype=np.float64, count=n)
 
-        players = list(session_results.keys())
-        profits = np.array(list(session_results.values()))
+        self.update_elo_indexed(sel, profits, session_date)
 
-        avg_profit = np.mean(np.abs(profits)) + 1e-6  # Avoid division by zero
-
-        for i in range(len(players)):
-            for j in range(i + 1, len(players)):
-                A, B = players[i], players[j]
-                Pa, Pb = session_results[A], session_results[B]
-
-                # Determine actual scores
-                Sa, Sb = (1, 0) if Pa > Pb else (0, 1) if Pa < Pb else (0.5, 0.5)
-
-                # Expected scores
-                Ea = self.expected_score(self.elo_ratings[A], self.elo_ratings[B])
-                Eb = 1 - Ea  # Since Ea + Eb = 1
+    def update_elo_indexed(self, sel, profits, session_date=None):
+        """
+        Update ELO based on a session result given as parallel arrays.
+        sel: array of player indices into self.names
+        profits: array of net profits, one per entry in sel
+        session_date: datetime object for the session date
+        """
+        # Skip sessions with less than 2 players; there are no pairs to score
+        if len(sel) < 2:
+            return
 
-                # Dynamic K-factor based on profit difference
-                K = K_BASE * (1 + abs(Pa - Pb) / avg_profit)
+        if session_date is None:
+            session_date = datetime.now()
 
-                # Update ratings
-                self.elo_ratings[A] += K * (Sa - Ea)
-                self.elo_ratings[B] += K * (Sb - Eb)
+        # Bind constants and the ratings array once; the kernel takes them
+        # as arguments so nothing is looked up inside the pair loop
+        ratings = self._ratings
+        delta = _elo_deltas(ratings[sel], profits, K_BASE, _LN10_OVER_400)
+        ratings[sel] += delta
 
         # Update last played dates for all players in the session
-        for player in players:
-            self.last_played[player] = session_date
+        self.last_played[sel] = pd.Timestamp(session_date).to_datetime64()
+
+        # Rankings must be re-sorted on next access
+        self._ranking_cache = None
 
     def get_rankings(self):
         """Return rankings sorted by ELO."""
-        return sorted(self.elo_ratings.items(), key=lambda x: x[1], reverse=True)
+        if self._ranking_cache is None:
+            order = np.argsort(-self._ratings, kind='stable')
+            self._ranking_cache = [(self.names[i], float(self._ratings[i])) for i in order]
+        return list(self._ranking_cache)
+
+    def get_top(self, k=None):
+        """Return the top k rankings sorted by ELO (all players if k is None)."""
+        if k is None or k >= len(self._ratings):
+            return self.get_rankings()
+        if k <= 0:
+            return []
+        if self._ranking_cache is not None:
+            return self._ranking_cache[:k]
+
+        # Keep every player tied with the k-th best rating as a candidate,
+        # then break ties by index so the result matches get_rankings()[:k]
+        neg_ratings = -self._ratings
+        cutoff = np.partition(neg_ratings, k - 1)[k - 1]
+        candidates = np.flatnonzero(~(neg_ratings > cutoff))  # NaN ratings sort last, as in argsort
+        top = candidates[np.lexsort((candidates, neg_ratings[candidates]))][:k]
+        return [(self.names[i], float(self._ratings[i])) for i in top]
 
 # Example Usage:
 if __name__ == "__main__":
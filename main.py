@@ -1,38 +1,31 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import json
 import argparse
+import sys
 from datetime import datetime
 from algo import PokerELO
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib json module
+    orjson = None
+
 def load_poker_data(csv_file):
     """Load poker data from CSV file and clean it."""
     # Read CSV with correct handling of empty cells
     df = pd.read_csv(csv_file, header=0)
 
     # Fix the column names (first row contains headers)
-    # Find the column containing 'Date'
-    date_col = None
-    for col in df.columns:
-        if 'Date' in str(df[col].iloc[0]):
-            date_col = col
-            break
-
-    if date_col:
-        # Extract the real headers from the first row
-        new_headers = {}
-        for col in df.columns:
-            if pd.notna(df[col].iloc[0]):
-                new_headers[col] = df[col].iloc[0].strip()
-            else:
-                new_headers[col] = col
-
-        # Rename columns
-        df = df.rename(columns=new_headers)
-
-        # Remove the first row (now in headers)
-        df = df.iloc[1:].reset_index(drop=True)
+    # Detect a 'Date' cell anywhere in the first row
+    first_row = df.iloc[0]
+    if first_row.astype(str).str.contains('Date', regex=False).any():
+        # Extract the real headers from the first row, keeping the
+        # original name wherever the first row is empty
+        new_headers = first_row.str.strip().fillna(pd.Series(df.columns, index=df.columns))
+
+        # Rename columns and remove the first row (now in headers)
+        df = df.rename(columns=new_headers.to_dict()).iloc[1:].reset_index(drop=True)
 
     # Clean up unnamed columns
     df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
@@ -41,82 +34,99 @@ def load_poker_data(csv_file):
     df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
 
     # Drop rows with no data
-    df = df.dropna(subset=['Date'], how='all')
-    df = df.reset_index(drop=True)
+    df = df.dropna(subset=['Date']).reset_index(drop=True)
 
-    # Convert numeric values to float
-    player_columns = [col for col in df.columns if col != 'Date']
-    for col in player_columns:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
+    # Convert numeric values to float in one pass
+    player_columns = df.columns.difference(['Date'], sort=False)
+    df[player_columns] = df[player_columns].apply(pd.to_numeric, errors='coerce')
 
     return df
 
-def process_poker_sessions(df):
-    """Process each poker session and calculate ELO."""
+def process_poker_sessions(df, verbose=False, top_k=10):
+    """Process each poker session and calculate ELO.
+
+    When verbose is set, the session results and the top_k updated
+    rankings are printed after every session.
+    """
     # Get all player names (columns except Date and unnamed columns)
     player_columns = [col for col in df.columns if col != 'Date' and not col.startswith('Unnamed')]
 
     # Initialize ELO system with all players
     elo_system = PokerELO(player_columns)
 
-    # Store ELO history
-    elo_history = []
+    # Reshape to one row per (session, player) result; missing values mean
+    # the player did not participate in that session
+    results = (df[['Date'] + player_columns]
+               .rename_axis('Session')
+               .reset_index()
+               .melt(id_vars=['Session', 'Date'], var_name='Player', value_name='Profit')
+               .dropna(subset=['Profit']))
+    results['Player'] = pd.Categorical(results['Player'], categories=elo_system.names)
 
-    # Process each session
-    for idx, row in df.iterrows():
-        date = row['Date']
+    # Skip sessions with less than 2 players
+    results = results[results.groupby('Session')['Profit'].transform('size') >= 2]
 
-        # Create session results dictionary
-        session_results = {}
-        for player in player_columns:
-            if pd.notna(row[player]):  # Only include players who participated in this session
-                session_results[player] = row[player]
+    # Store ELO history, one row per processed session
+    dates = df['Date'].to_numpy()
+    history = np.empty((len(df), len(player_columns)), dtype=np.float64)
+    history_dates = np.empty(len(df), dtype=dates.dtype)
+    n_sessions = 0
 
-        # Skip if less than 2 players
-        if len(session_results) < 2:
-            continue
+    # Process each session
+    for idx, session in results.groupby('Session', sort=True):
+        date = pd.Timestamp(dates[idx])
+        sel = session['Player'].cat.codes.to_numpy(dtype=np.intp)
+        profits = session['Profit'].to_numpy(dtype=np.float64)
 
         # Update ELO ratings with session date
-        elo_system.update_elo(session_results, date)
+        elo_system.update_elo_indexed(sel, profits, date)
 
         # Store current ELO ratings with date
-        current_ratings = {player: rating for player, rating in elo_system.elo_ratings.items()}
-        current_ratings['Date'] = date
-        elo_history.append(current_ratings)
+        history[n_sessions] = elo_system.ratings
+        history_dates[n_sessions] = dates[idx]
+        n_sessions += 1
 
         # Print results
-        print(f"\nSession {idx+1} - {date.strftime('%Y-%m-%d')}:")
-        print("Session Results:", session_results)
-        print("Updated ELO Ratings:")
-        rankings = elo_system.get_rankings()
-        for rank, (player, rating) in enumerate(rankings, 1):
-            print(f"{rank}. {player}: {round(rating, 2)}")
+        if verbose:
+            session_results = dict(zip(session['Player'].astype(str), profits.tolist()))
+            lines = [f"{rank}. {player}: {rating:.2f}"
+                     for rank, (player, rating) in enumerate(elo_system.get_top(top_k), 1)]
+            sys.stdout.write(f"\nSession {idx+1} - {date:%Y-%m-%d}:\n"
+                             f"Session Results: {session_results}\n"
+                             "Updated ELO Ratings:\n" + "\n".join(lines) + "\n")
 
     # Create ELO history dataframe
-    elo_history_df = pd.DataFrame(elo_history)
+    elo_history_df = pd.DataFrame(history[:n_sessions], columns=elo_system.names)
+    elo_history_df['Date'] = history_dates[:n_sessions]
     return elo_history_df, elo_system
 
 def plot_elo_history(elo_history_df, output_path='elo_history.png'):
     """Plot ELO ratings over time."""
-    plt.figure(figsize=(12, 8))
+    # Imported here so runs with --no-plot don't pay for loading matplotlib
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(12, 8))
 
     # Get player columns (all columns except 'Date')
     player_columns = [col for col in elo_history_df.columns if col != 'Date']
 
     # Plot each player's ELO rating
+    dates = elo_history_df['Date'].to_numpy()
     for player in player_columns:
-        plt.plot(elo_history_df['Date'], elo_history_df[player], marker='o', label=player)
+        ax.plot(dates, elo_history_df[player].to_numpy(), marker='o', label=player)
 
-    plt.title('Poker ELO Ratings Over Time')
-    plt.xlabel('Date')
-    plt.ylabel('ELO Rating')
-    plt.grid(True, alpha=0.3)
-    plt.legend()
+    ax.set_title('Poker ELO Ratings Over Time')
+    ax.set_xlabel('Date')
+    ax.set_ylabel('ELO Rating')
+    ax.grid(True, alpha=0.3)
+    ax.legend()
 
     # Save the figure
-    plt.savefig(output_path, dpi=300, bbox_inches='tight')
+    fig.savefig(output_path, dpi=300, bbox_inches='tight')
     print(f"ELO history plot saved to {output_path}")
-    plt.close()
+    plt.close(fig)
 
 def save_elo_to_json(elo_system, elo_history_df, output_file='elo_ratings.json'):
     """Save ELO ratings to JSON for easy access."""
@@ -129,14 +139,11 @@ def save_elo_to_json(elo_system, elo_history_df, output_file='elo_ratings.json')
                      for idx, (player, rating) in enumerate(rankings)]
 
     # Format history for JSON
-    history = []
-    for _, row in elo_history_df.iterrows():
-        date_str = row['Date'].strftime('%Y-%m-%d')
-        session_ratings = {player: round(row[player], 2) for player in row.index if player != 'Date'}
-        history.append({
-            "date": date_str,
-            "ratings": session_ratings
-        })
+    player_columns = [col for col in elo_history_df.columns if col != 'Date']
+    dates = elo_history_df['Date'].dt.strftime('%Y-%m-%d').tolist()
+    session_ratings = elo_history_df[player_columns].round(2).to_dict(orient='records')
+    history = [{"date": date_str, "ratings": ratings}
+               for date_str, ratings in zip(dates, session_ratings)]
 
     # Create JSON structure
     elo_data = {
@@ -147,8 +154,12 @@ def save_elo_to_json(elo_system, elo_history_df, output_file='elo_ratings.json')
     }
 
     # Save to file
-    with open(output_file, 'w') as f:
-        json.dump(elo_data, f, indent=2)
+    if orjson is not None:
+        with open(output_file, 'wb') as f:
+            f.write(orjson.dumps(elo_data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(elo_data, f, indent=2, ensure_ascii=False)
 
     print(f"ELO ratings saved to {output_file}")
 
@@ -165,6 +176,8 @@ def parse_args():
                         help='Output PNG file for ELO history plot')
     parser.add_argument('--no-plot', action='store_true',
                         help='Disable plotting ELO history')
+    parser.add_argument('--verbose', '-v', action='store_true',
+                        help='Print the session results and top 10 rankings after every session')
     return parser.parse_args()
 
 def main():
@@ -175,7 +188,7 @@ def main():
     poker_df = load_poker_data(args.input)
 
     # Process all sessions
-    elo_history_df, final_elo = process_poker_sessions(poker_df)
+    elo_history_df, final_elo = process_poker_sessions(poker_df, verbose=args.verbose)
 
     # Save ELO history to CSV
     elo_history_df.to_csv(args.output_csv, index=False)